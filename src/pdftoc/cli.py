@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import argparse
+import io
 import os
 import re
 import subprocess
@@ -16,17 +17,19 @@ from .detect import detect_headings, Heading
 from .extract import extract_spans
 from .writer import write_toc
 
+_TOC_LINE_RE = re.compile(r"^( *)(.*?)\s{2,}\(p\.\s*(\d+)\)\s*$")
+
 
 def format_toc(headings: list[Heading]) -> str:
     """Format headings as human-readable/editable text.
 
     Each line has 2-space indentation per level and a (p. N) suffix (1-indexed).
     """
-    lines: list[str] = []
+    buf = io.StringIO()
+    write = buf.write
     for h in headings:
-        indent = "  " * (h.level - 1)
-        lines.append(f"{indent}{h.text}  (p. {h.page + 1})")
-    return "\n".join(lines) + "\n"
+        write(f"{'  ' * (h.level - 1)}{h.text}  (p. {h.page + 1})\n")
+    return buf.getvalue()
 
 
 def parse_toc(text: str) -> list[Heading]:
@@ -36,13 +39,12 @@ def parse_toc(text: str) -> list[Heading]:
       <indentation><title>  (p. <page>)
     where indentation is multiples of 2 spaces.
     """
-    pattern = re.compile(r"^( *)(.*?)\s{2,}\(p\.\s*(\d+)\)\s*$")
     headings: list[Heading] = []
 
     for lineno, line in enumerate(text.splitlines(), start=1):
         if not line.strip():
             continue
-        m = pattern.match(line)
+        m = _TOC_LINE_RE.match(line)
         if not m:
             print(f"Error: malformed TOC line {lineno}: {line!r}", file=sys.stderr)
             sys.exit(1)
@@ -61,6 +63,16 @@ def parse_toc(text: str) -> list[Heading]:
     return headings
 
 
+def _positive_int(value: str) -> int:
+    try:
+        n = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}") from None
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {n}")
+    return n
+
+
 def _build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         prog="pdftoc",
@@ -88,6 +100,10 @@ def _build_parser() -> argparse.ArgumentParser:
         "--edit", action="store_true",
         help="Open auto-detected TOC in $EDITOR for manual editing before writing",
     )
+    parser.add_argument(
+        "-j", "--jobs", type=_positive_int, default=1, metavar="N",
+        help="Extract text with N worker processes (default: 1)",
+    )
     parser.add_argument(
         "--toc", type=Path, default=None, metavar="FILE",
         help="Import TOC from a text file instead of auto-detecting",
@@ -137,12 +153,13 @@ def main(argv: list[str] | None = None) -> None:
             doc.close()
             sys.exit(1)
     else:
-        spans = extract_spans(doc)
+        spans, page_heights = extract_spans(doc, jobs=args.jobs)
         headings = detect_headings(
             spans,
             total_pages=len(doc),
             max_level=args.max_level,
             debug=args.debug,
+            page_heights=page_heights,
         )
         if not headings:
             print("No headings detected.", file=sys.stderr)
@@ -5,94 +5,119 @@ from __future__ import annotations
 import math
 import re
 import sys
-from collections import Counter
+from collections import Counter, defaultdict
+from collections.abc import Iterable
 from dataclasses import dataclass
+from itertools import accumulate
 
 from .extract import Span
 
+_A4_HEIGHT = 842.0  # points
+_MIN_RECURRING_PAGES = 5  # shorter documents skip header/footer detection
+_BOLD_BONUS = 2.0  # score boost for bold text, in points
+_ROMAN_CHARS = frozenset("ivxlcdmIVXLCDM")
+_MAX_ROMAN_LEN = 15  # real roman page numbers are short ("lxxxviii" is 8)
+_SECTION_NUM_RE = re.compile(r"\d")
+_CAPTION_RE = re.compile(r"(Figure|Fig\.|Table|Listing|Algorithm)\s+\d", re.IGNORECASE)
 
-@dataclass
+
+@dataclass(slots=True)
 class Heading:
     text: str
     level: int  # 1-based
     page: int   # 0-indexed
 
 
-def _char_count_by_size(spans: list[Span]) -> Counter:
-    """Count total characters per font size."""
-    counts: Counter = Counter()
-    for s in spans:
-        counts[s.size] += len(s.text)
-    return counts
-
-
-def _find_body_size(spans: list[Span]) -> float:
-    """The most common font size (by character count) is body text."""
-    counts = _char_count_by_size(spans)
-    return counts.most_common(1)[0][0]
-
+@dataclass(slots=True)
+class _Candidate:
+    text: str
+    size: float
+    bold: bool
+    score: float
+    bbox: tuple[float, float, float, float]  # x0, y0, x1, y1
+    page: int  # 0-indexed
 
-def _find_recurring_texts(
-    spans: list[Span], total_pages: int, zone_frac: float = 0.08, threshold: float = 0.3
-) -> set[str]:
-    """Find text that appears in the top/bottom zone on many pages (headers/footers)."""
-    if total_pages < 3:
-        return set()
 
-    page_height_cache: dict[int, float] = {}
+def _scan_spans(
+    spans: list[Span],
+    total_pages: int,
+    page_heights: list[float],
+    zone_frac: float = 0.08,
+    threshold: float = 0.3,
+) -> tuple[dict[float, int], set[str]]:
+    """Single pass over spans collecting the font histogram and recurring text.
+
+    Returns (chars per font size, text that appears in the top/bottom zone on
+    many pages). The most common size by character count is body text;
+    recurring zone text is headers/footers.
+    """
+    # defaultdict(int) rather than Counter: no __missing__ override on the hot path
+    char_counts: dict[float, int] = defaultdict(int)
+    # In shorter documents a text on 2 of a handful of pages is too weak a
+    # signal to call it a header/footer, so skip zone tracking entirely.
+    find_recurring = total_pages >= _MIN_RECURRING_PAGES
+
+    # Zone boundaries per page, indexed by page number
+    top_zones = [h * zone_frac for h in page_heights]
+    bot_zones = [h * (1 - zone_frac) for h in page_heights]
     zone_texts: Counter = Counter()
-    seen_per_page: dict[int, set[str]] = {}
+    # (page, text) pairs already counted, so a text counts once per page
+    seen_pairs: set[tuple[int, str]] = set()
 
     for s in spans:
+        char_counts[s.size] += len(s.text)
+        if not find_recurring:
+            continue
+
         pg = s.page
-        if pg not in seen_per_page:
-            seen_per_page[pg] = set()
-
-        # We need page height; approximate from bbox max y seen on that page
-        if pg not in page_height_cache:
-            page_height_cache[pg] = 842.0  # A4 default, updated below
-
-        y_top = s.bbox[1]
-        y_bot = s.bbox[3]
-        page_h = page_height_cache[pg]
-        top_zone = page_h * zone_frac
-        bot_zone = page_h * (1 - zone_frac)
-
-        if y_top < top_zone or y_bot > bot_zone:
-            normalized = s.text.strip().lower()
-            # Skip pure numbers (page numbers)
-            if normalized and normalized not in seen_per_page[pg]:
-                seen_per_page[pg].add(normalized)
-                zone_texts[normalized] += 1
+        if not (s.bbox[1] < top_zones[pg] or s.bbox[3] > bot_zones[pg]):
+            continue
+        normalized = s.text.strip().lower()
+        if not normalized:
+            continue
+        key = (pg, normalized)
+        if key in seen_pairs:
+            continue
+        seen_pairs.add(key)
+        zone_texts[normalized] += 1
+
+    if not find_recurring:
+        return char_counts, set()
 
     min_count = max(2, int(total_pages * threshold))
-    return {t for t, c in zone_texts.items() if c >= min_count}
+    return char_counts, {t for t, c in zone_texts.items() if c >= min_count}
 
 
 def _is_page_number(text: str) -> bool:
     """Check if text looks like a page number."""
     stripped = text.strip()
+    if not stripped:
+        return False
     # Pure digits, or roman numerals, or "Page X"
-    if re.fullmatch(r"\d+", stripped):
+    if stripped.isdecimal():
         return True
-    if re.fullmatch(r"[ivxlcdm]+", stripped, re.IGNORECASE):
-        return True
-    if re.fullmatch(r"page\s+\d+", stripped, re.IGNORECASE):
+    if len(stripped) <= _MAX_ROMAN_LEN and all(c in _ROMAN_CHARS for c in stripped):
         return True
+    if stripped[:4].lower() == "page":
+        rest = stripped[4:]
+        return rest[:1].isspace() and rest.lstrip().isdecimal()
     return False
 
 
 def _is_caption(text: str) -> bool:
     """Check if text looks like a figure/table caption."""
-    return bool(re.match(r"^(Figure|Fig\.|Table|Listing|Algorithm)\s+\d", text, re.IGNORECASE))
+    return bool(_CAPTION_RE.match(text))
 
 
 def _effective_score(size: float, bold: bool) -> float:
-    """Score for ranking heading candidates."""
-    return size + (2.0 if bold else 0.0)
+    """Score for ranking heading candidates.
+
+    Inlined in the detect_headings candidate loop; keep the two in sync.
+    """
+    return size + (_BOLD_BONUS if bold else 0.0)
 
 
-def _cluster_levels(scores: list[float]) -> dict[float, int]:
+def _cluster_levels(scores: Iterable[float]) -> dict[float, int]:
     """Map distinct heading scores to levels 1, 2, 3, ...
 
     Scores are sorted descending — highest score = level 1.
@@ -102,38 +127,42 @@ def _cluster_levels(scores: list[float]) -> dict[float, int]:
     if not unique:
         return {}
 
-    mapping: dict[float, int] = {}
-    level = 1
-    mapping[unique[0]] = level
-    for i in range(1, len(unique)):
-        if unique[i - 1] - unique[i] > 0.5:
-            level += 1
-        mapping[unique[i]] = level
-    return mapping
+    # Level of each score = 1 + number of >0.5 gaps above it (a running sum)
+    gaps = (hi - lo > 0.5 for hi, lo in zip(unique, unique[1:]))
+    return dict(zip(unique, accumulate(gaps, initial=1)))
 
 
-def _merge_spans_on_same_line(candidates: list[dict]) -> list[dict]:
+def _merge_spans_on_same_line(candidates: list[_Candidate]) -> list[_Candidate]:
     """Merge heading spans that are on the same page and roughly the same y-position."""
     if not candidates:
         return []
 
-    merged: list[dict] = [candidates[0]]
+    merged: list[_Candidate] = []
+    group = candidates[0]
+    parts = [group.text]
+    x0, y0, x1, y1 = group.bbox
+    y_mid = (y0 + y1) / 2
+
     for c in candidates[1:]:
-        prev = merged[-1]
-        # Same page and y-centers within 2pt
-        if (c["page"] == prev["page"]
-                and abs((c["bbox"][1] + c["bbox"][3]) / 2
-                        - (prev["bbox"][1] + prev["bbox"][3]) / 2) < 2.0):
-            prev["text"] = prev["text"] + " " + c["text"]
+        cx0, cy0, cx1, cy1 = c.bbox
+        # Same page and y-centers (of the group so far) within 2pt
+        if c.page == group.page and abs((cy0 + cy1) / 2 - y_mid) < 2.0:
+            parts.append(c.text)
             # Extend bbox
-            prev["bbox"] = (
-                min(prev["bbox"][0], c["bbox"][0]),
-                min(prev["bbox"][1], c["bbox"][1]),
-                max(prev["bbox"][2], c["bbox"][2]),
-                max(prev["bbox"][3], c["bbox"][3]),
-            )
+            x0, y0 = min(x0, cx0), min(y0, cy0)
+            x1, y1 = max(x1, cx1), max(y1, cy1)
+            y_mid = (y0 + y1) / 2
         else:
-            merged.append(c)
+            group.text = " ".join(parts)
+            group.bbox = (x0, y0, x1, y1)
+            merged.append(group)
+            group = c
+            parts = [c.text]
+            x0, y0, x1, y1 = cx0, cy0, cx1, cy1
+            y_mid = (y0 + y1) / 2
+    group.text = " ".join(parts)
+    group.bbox = (x0, y0, x1, y1)
+    merged.append(group)
     return merged
 
 
@@ -143,19 +172,18 @@ def _fix_level_gaps(headings: list[Heading]) -> list[Heading]:
         return headings
 
     fixed: list[Heading] = []
-    level_stack: list[int] = []
+    # Stack of open input levels, strictly increasing, so its depth never
+    # exceeds the deepest input level. Preallocated; `depth` is the top.
+    level_stack = [0] * max(h.level for h in headings)
+    depth = 0
 
     for h in headings:
-        if not level_stack:
-            fixed.append(Heading(h.text, 1, h.page))
-            level_stack.append(h.level)
-        else:
-            # Find the correct output level
-            while level_stack and level_stack[-1] >= h.level:
-                level_stack.pop()
-            out_level = len(level_stack) + 1
-            fixed.append(Heading(h.text, out_level, h.page))
-            level_stack.append(h.level)
+        # Find the correct output level
+        while depth and level_stack[depth - 1] >= h.level:
+            depth -= 1
+        level_stack[depth] = h.level
+        depth += 1
+        fixed.append(Heading(h.text, depth, h.page))
 
     return fixed
 
@@ -165,17 +193,23 @@ def detect_headings(
     total_pages: int,
     max_level: int = 6,
     debug: bool = False,
+    page_heights: list[float] | None = None,
 ) -> list[Heading]:
     """Detect headings from spans using font size analysis.
 
+    page_heights gives the height of each page in points (as returned by
+    extract_spans); if omitted, every page is assumed to be A4.
+
     Returns headings in document order with 1-based levels.
     """
     if not spans:
         return []
+    if page_heights is None:
+        page_heights = [_A4_HEIGHT] * total_pages
 
-    # Step 1: Find body font size
-    body_size = _find_body_size(spans)
-    char_counts = _char_count_by_size(spans)
+    # Step 1: Font histogram and recurring header/footer text, in one pass
+    char_counts, recurring = _scan_spans(spans, total_pages, page_heights)
+    body_size = max(char_counts, key=char_counts.__getitem__)
 
     if debug:
         print("=== Font Histogram (chars per size) ===", file=sys.stderr)
@@ -184,8 +218,7 @@ def detect_headings(
             print(f"  {size:6.1f}pt: {count:>6d} chars{marker}", file=sys.stderr)
         print(file=sys.stderr)
 
-    # Step 2: Find recurring header/footer text
-    recurring = _find_recurring_texts(spans, total_pages)
+    # Step 2: Report recurring header/footer text
     if debug and recurring:
         print(f"=== Filtered recurring text ({len(recurring)}) ===", file=sys.stderr)
         for t in sorted(recurring):
@@ -193,8 +226,18 @@ def detect_headings(
         print(file=sys.stderr)
 
     # Step 3: Identify heading candidates
-    candidates: list[dict] = []
+    candidates: list[_Candidate] = []
+    body_score = _effective_score(body_size, False)
     for s in spans:
+        # Heading criteria: larger than body, OR bold at body size.
+        # Checked first: it is cheap and rejects the bulk of (body text) spans
+        # before any string normalization or regex work.
+        # Same as _effective_score(s.size, s.bold), inlined for the hot loop.
+        score = s.size + _BOLD_BONUS if s.bold else s.size
+
+        if score <= body_score:
+            continue
+
         # Skip noise
         if s.text.strip().lower() in recurring:
             continue
@@ -203,25 +246,18 @@ def detect_headings(
         if _is_caption(s.text):
             continue
 
-        # Heading criteria: larger than body, OR bold at body size
-        score = _effective_score(s.size, s.bold)
-        body_score = _effective_score(body_size, False)
-
-        if score <= body_score:
-            continue
-
         # Skip very short text (likely noise) unless it looks like a section number
-        if len(s.text.strip()) < 2 and not re.match(r"^\d", s.text.strip()):
+        if len(s.text.strip()) < 2 and not _SECTION_NUM_RE.match(s.text.strip()):
             continue
 
-        candidates.append({
-            "text": s.text.strip(),
-            "size": s.size,
-            "bold": s.bold,
-            "score": score,
-            "bbox": s.bbox,
-            "page": s.page,
-        })
+        candidates.append(_Candidate(
+            text=s.text.strip(),
+            size=s.size,
+            bold=s.bold,
+            score=score,
+            bbox=s.bbox,
+            page=s.page,
+        ))
 
     # Step 4: Merge spans on same line
     candidates = _merge_spans_on_same_line(candidates)
@@ -230,8 +266,8 @@ def detect_headings(
         return []
 
     # Step 5: Cluster scores into levels
-    scores = [c["score"] for c in candidates]
-    score_to_level = _cluster_levels(scores)
+    # Only distinct scores matter; stream them instead of building a list
+    score_to_level = _cluster_levels(c.score for c in candidates)
 
     if debug:
         print("=== Score → Level mapping ===", file=sys.stderr)
@@ -242,13 +278,13 @@ def detect_headings(
     # Step 6: Build headings
     headings: list[Heading] = []
     for c in candidates:
-        level = score_to_level[c["score"]]
+        level = score_to_level[c.score]
         if level > max_level:
             continue
         headings.append(Heading(
-            text=c["text"],
+            text=c.text,
             level=level,
-            page=c["page"],
+            page=c.page,
         ))
 
     # Step 7: Fix level gaps
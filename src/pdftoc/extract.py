@@ -2,12 +2,19 @@
 
 from __future__ import annotations
 
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
+from itertools import repeat
 
 import pymupdf
 
+# Keep whitespace as-is; drop text outside the page's mediabox (never visible,
+# so never a heading). Image blocks are not requested.
+_TEXT_FLAGS = pymupdf.TEXT_PRESERVE_WHITESPACE | pymupdf.TEXT_MEDIABOX_CLIP
 
-@dataclass
+
+@dataclass(slots=True)
 class Span:
     text: str
     size: float
@@ -17,12 +24,21 @@ class Span:
     page: int  # 0-indexed
 
 
-def extract_spans(doc: pymupdf.Document) -> list[Span]:
-    """Return every text span in document order with font metadata."""
+def _extract_pages(
+    doc: pymupdf.Document, start: int, stop: int
+) -> tuple[list[Span], list[float]]:
+    """Extract spans and page heights for pages start..stop-1."""
     spans: list[Span] = []
-    for page_num in range(len(doc)):
+    page_heights: list[float] = []
+    for page_num in range(start, stop):
         page = doc[page_num]
-        blocks = page.get_text("dict", flags=pymupdf.TEXT_PRESERVE_WHITESPACE)["blocks"]
+        # Span bboxes are in unrotated coordinates; page.rect is rotated
+        page_heights.append(page.cropbox.height)
+        # Build the text page directly and drop it (and, below, the dict) once
+        # used, so only one page's extraction is alive at a time.
+        textpage = page.get_textpage(flags=_TEXT_FLAGS)
+        blocks = textpage.extractDICT()["blocks"]
+        del textpage
         for block in blocks:
             if block["type"] != 0:  # text block
                 continue
@@ -32,12 +48,52 @@ def extract_spans(doc: pymupdf.Document) -> list[Span]:
                     if not text:
                         continue
                     bold = bool(s["flags"] & (1 << 4))
+                    # PyMuPDF hands back a fresh name string for every span;
+                    # intern it so all spans share one string per font.
+                    font = sys.intern(s["font"])
                     spans.append(Span(
                         text=text,
                         size=round(s["size"], 2),
                         bold=bold,
-                        font=s["font"],
+                        font=font,
                         bbox=tuple(s["bbox"]),
                         page=page_num,
                     ))
-    return spans
+        del blocks
+    return spans, page_heights
+
+
+def _extract_pages_from_file(
+    path: str, start: int, stop: int
+) -> tuple[list[Span], list[float]]:
+    """Worker entry point: open the PDF in this process and extract a page range."""
+    with pymupdf.open(path) as doc:
+        return _extract_pages(doc, start, stop)
+
+
+def extract_spans(doc: pymupdf.Document, jobs: int = 1) -> tuple[list[Span], list[float]]:
+    """Return every text span in document order with font metadata.
+
+    Also returns the height of each page in points, indexed by page number.
+
+    With jobs > 1, contiguous page ranges are extracted in worker processes
+    that each reopen the file (PyMuPDF is not thread-safe, so threads would
+    not help). Documents that workers cannot reopen identically from disk --
+    opened from memory, carrying unsaved edits, or password-protected -- are
+    always extracted serially.
+    """
+    num_pages = len(doc)
+    jobs = min(jobs, num_pages)
+    if (jobs <= 1 or not doc.name or doc.stream is not None
+            or doc.is_dirty or doc.needs_pass):
+        return _extract_pages(doc, 0, num_pages)
+
+    bounds = [num_pages * i // jobs for i in range(jobs + 1)]
+    spans: list[Span] = []
+    page_heights: list[float] = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        results = pool.map(_extract_pages_from_file, repeat(doc.name), bounds[:-1], bounds[1:])
+        for chunk_spans, chunk_heights in results:
+            spans.extend(chunk_spans)
+            page_heights.extend(chunk_heights)
+    return spans, page_heights